@@ -1,7 +1,6 @@
 """Demonstrate the QG (quasi-geostrophic) model."""
 
 import numpy as np
-import scipy.ndimage.filters as filters
 from matplotlib import pyplot as plt
 
 from dapper.mods.QG import default_prms, nx, sample_filename, square
@@ -32,12 +31,24 @@ def show(x0, psi=True, ax=None):
 # Although psi is the state variable, q looks cooler.
 # q = Nabla^2(psi) - F*psi.
 dx = 1/(nx-1)
+# Stencil weights for compute_q, precomputed (in float32, like psi).
+inv_dx2 = np.float32(1/dx**2)
+w_centre = np.float32(-4 - default_prms['F']*dx**2)
 
 
 def compute_q(psi):
-    Lapl = filters.laplace(psi, mode='constant')/dx**2
-    # mode='constant' coz BCs are: psi = nabla psi = nabla^2 psi = 0
-    return Lapl - default_prms['F']*psi
+    psi = np.asarray(psi, dtype=np.float32)
+    # 5-point stencil, accumulated in-place in q, with the -F*psi term fused
+    # into the centre weight. Equivalent to (but leaner than)
+    # scipy.ndimage.laplace(psi, mode='constant')/dx**2 - F*psi.
+    # Zero padding coz BCs are: psi = nabla psi = nabla^2 psi = 0
+    q = psi * w_centre
+    q[1:] += psi[:-1]
+    q[:-1] += psi[1:]
+    q[:, 1:] += psi[:, :-1]
+    q[:, :-1] += psi[:, 1:]
+    q *= inv_dx2
+    return q
 
 
 nwp_data_filename = Path(f'/nobackup/smhid20/users/sm_maran/dpr_data/simulations/LRES_NWP_10000.npy')
@@ -51,8 +62,9 @@ if __name__ == "__main__":
     ax2.set_title('$q$')
 
     #xx = np.load(sample_filename)['sample']
-    X_hres = np.load(data_filename)
-    X_lres = np.load(nwp_data_filename)
+    # Memory-map, so that frames only get read as they are animated.
+    X_hres = np.load(data_filename, mmap_mode='r')
+    X_lres = np.load(nwp_data_filename, mmap_mode='r')
     setter1 = show(X_hres[0], psi=True , ax=ax1)
     setter2 = show(X_lres[0], psi=True , ax=ax2)
     #setter2 = show(xx[0], psi=False, ax=ax2)
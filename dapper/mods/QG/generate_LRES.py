@@ -1,3 +1,5 @@
+import os
+
 import numpy as np
 from pathlib import Path
 
@@ -10,14 +12,29 @@ kmax = 150
 input_filename = Path(f'/nobackup/smhid20/users/sm_maran/dpr_data/simulations/QG_samples_SUBS_{iterations}.npy')
 output_filename = Path(f'/nobackup/smhid20/users/sm_maran/dpr_data/simulations/QG_samples_LRES_{iterations}_n_{n}_k_{kmax}.npy')
 
-X_lp = np.load(input_filename)
+X_lp = np.load(input_filename, mmap_mode='r')
 
 model = QG.model_config("MY_step_model", {})
-simulator = QG.modelling.with_recursion(model.step, prog=False)
 
 N = X_lp.shape[0]
 prd_x = slice(n, N)
 
-sample = simulator(X_lp[prd_x], kmax, 0.0, model.prms["dtout"])
-
-np.save(output_filename, sample)
+# The (Fortran) model runs in float64.
+E = X_lp[prd_x].astype('float64')
+
+# Like QG.modelling.with_recursion, but writing each state straight to disk
+# rather than accumulating the trajectories in RAM.
+# float32 suffices for storage.
+# Write to a temporary name, so that a crashed (or timed-out) run
+# does not leave behind a complete-looking (but zero-padded) file.
+partial_filename = output_filename.with_suffix('.partial.npy')
+sample = np.lib.format.open_memmap(partial_filename, mode='w+',
+                                   dtype='float32', shape=(kmax+1,)+E.shape)
+sample[0] = E
+for k in range(1, kmax+1):
+    E = model.step(E, 0.0, model.prms["dtout"])
+    sample[k] = E
+
+sample.flush()
+del sample
+os.replace(partial_filename, output_filename)
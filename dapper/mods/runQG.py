@@ -1,3 +1,4 @@
+import os
 import numpy as np
 from pathlib import Path
 import QG
@@ -6,25 +7,71 @@ import argparse
 spinup=1000
 old_iterations = 101000
 iterations = old_iterations-spinup
+data_dir = Path('/nobackup/smhid20/users/sm_maran/dpr_data/simulations')
 
-parser = argparse.ArgumentParser()
-parser.add_argument("--number", type=int, default=1, help="Number flag")
-args = parser.parse_args()
 
-number = args.number
+def shard_filename(number):
+    return data_dir / f'QG_samples_HRES_{old_iterations}_{number}.npy'
 
-# Rest of your code...
 
-disk_new_data_filename = Path(f'/nobackup/smhid20/users/sm_maran/dpr_data/simulations/QG_samples_HRES_{old_iterations}_{number}')
-disk_old_data_filename = Path(f'/nobackup/smhid20/users/sm_maran/dpr_data/simulations/QG_samples_HRES_{old_iterations}_{number-1}.npy')
+def restart_filename(number):
+    """File with the exact (float64) last state of shard `number`."""
+    return data_dir / f'QG_restart_HRES_{old_iterations}_{number}.npy'
 
-X_lp = np.load(disk_old_data_filename)
 
-X_lp = X_lp[-1,:]
+def run_shard(number):
+    """Simulate shard `number`, continuing from the last state of shard `number-1`."""
+    disk_new_data_filename = shard_filename(number)
+    disk_old_data_filename = shard_filename(number-1)
 
-model = QG.model_config("MY_step_model", {})
-simulator = QG.modelling.with_recursion(model.step, prog=False)
+    # The trajectories are stored in float32, so restart from the exact
+    # (float64) state, lest the shards not form one continuous trajectory.
+    if restart_filename(number-1).is_file():
+        X_lp = np.load(restart_filename(number-1))
+    else:
+        # Legacy shards (generated before the restart files were introduced)
+        # were stored in float64, so their last state is exact.
+        X_lp = np.load(disk_old_data_filename, mmap_mode='r')
+        if X_lp.dtype != np.float64:
+            raise FileNotFoundError(
+                f"No restart file for shard {number-1} (did its run crash?). "
+                "Refusing to restart from its float32-rounded last state.")
+        # Only read the last state.
+        X_lp = np.array(X_lp[-1,:])
 
-sample = simulator(X_lp, iterations, 0.0, model.prms["dtout"])
+    model = QG.model_config("MY_step_model", {})
 
-np.save(disk_new_data_filename, sample)
+    # Like QG.modelling.with_recursion, but writing each state straight to disk
+    # rather than accumulating the trajectory in RAM.
+    # float32 suffices for storage, and halves the size of the file.
+    # Write to a temporary name, so that a crashed (or timed-out) run
+    # does not leave behind a complete-looking (but zero-padded) shard.
+    partial_filename = disk_new_data_filename.with_suffix('.partial.npy')
+    sample = np.lib.format.open_memmap(partial_filename, mode='w+', dtype='float32',
+                                       shape=(iterations+1,)+X_lp.shape)
+    x = X_lp
+    sample[0] = x
+    for k in range(1, iterations+1):
+        x = model.step(x, 0.0, model.prms["dtout"])
+        sample[k] = x
+        if k % 1000 == 0:
+            sample.flush()
+
+    sample.flush()
+    del sample
+    np.save(restart_filename(number), x)
+    os.replace(partial_filename, disk_new_data_filename)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", type=int, default=1, help="Number flag")
+    parser.add_argument("--shards", type=int, default=1,
+                        help="Number of consecutive shards to run, "
+                             "starting at --number")
+    args = parser.parse_args()
+
+    # Each shard is initialized by the last state of the previous one,
+    # so the shards form a chain, and must be run in order.
+    for number in range(args.number, args.number + args.shards):
+        run_shard(number)
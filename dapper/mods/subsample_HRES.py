@@ -1,39 +1,87 @@
-import scipy
 import numpy as np
+from scipy.signal import firwin, resample_poly
 from pathlib import Path
 import argparse
+import os
+from collections import deque
+from functools import partial
+from multiprocessing import Pool
 
 iterations = 101000
+data_dir = Path('/nobackup/smhid20/users/sm_maran/dpr_data/simulations')
 
-parser = argparse.ArgumentParser()
-parser.add_argument("--number", type=int, default=1, help="Number flag")
-args = parser.parse_args()
+# Same anti-aliasing filter as `scipy.signal.decimate(x, 2, ftype='fir')`,
+# but built once here rather than on every call.
+# In float32, like the frames, lest `resample_poly` upcasts them to float64.
+q = 2
+fir = firwin(20*q+1, 1/q, window='hamming').astype('float32')
 
-number = args.number
+def subsample(X):
+    """Decimate the last two axes (i.e. each frame) of `X` by `q`."""
+    X = resample_poly(X, 1, q, axis=-2, window=fir)
+    X = resample_poly(X, 1, q, axis=-1, window=fir)
+    return X
 
-input_filename = Path(f'/nobackup/smhid20/users/sm_maran/dpr_data/simulations/QG_samples_HRES_{iterations}_{number}.npy')
-output_filename = Path(f'/nobackup/smhid20/users/sm_maran/dpr_data/simulations/QG_samples_SUBS_{iterations}_{number}.npy')
+def subsample_batch(input_filename, i, batch_size):
+    """Subsample frames `i:i+batch_size` of `input_filename`.
 
-print("Script started")
+    The worker processes read their own batch directly from the memory-mapped
+    input, so that the frames need not be pickled and sent over.
+    """
+    X_lp = np.load(input_filename, mmap_mode='r')
+    X_lp = X_lp.reshape((X_lp.shape[0], 2**7+1, 2**7+1))
+    # Cast per batch (casting the whole memmap would read it all into RAM).
+    X = X_lp[i:i+batch_size].astype('float32', copy=False)
+    return subsample(X)
 
-def subsample(x):
-    x = scipy.signal.decimate(x, 2, n=None, ftype='fir', axis=0)
-    x = scipy.signal.decimate(x, 2, n=None, ftype='fir', axis=1)
-    return x
-
-def generate_SUBS():
-    X_lp = np.load(input_filename)#['sample'].astype('float32')
+def generate_SUBS(input_filename, output_filename, batch_size=1024, nproc=None):
+    # Memory-map the input, so that frames only get read as they are processed.
+    X_lp = np.load(input_filename, mmap_mode='r')
 
     if X_lp.shape[1] != (2**7+1)**2:
         print("Input has wrong dimensions")
         return
 
-    X_lp = np.array([X_lp[i].reshape((2**7+1,2**7+1)) for i in range(X_lp.shape[0])])
+    N = X_lp.shape[0]
+
+    # Write straight into the output file, rather than accumulating in RAM.
+    n_sub = len(range(0, 2**7+1, q))
+    X_sub = np.lib.format.open_memmap(
+        output_filename, mode='w+', dtype='float32', shape=(N, n_sub*n_sub))
+    # Frame-shaped view (no copy) of the output. Writing the (non-contiguous)
+    # batches into it avoids copying them just to flatten their frames.
+    frames = X_sub.reshape((N, n_sub, n_sub))
+
+    # Decimate in batches, in parallel (the frames are independent).
+    # At most 2*nproc batches are in flight (i.e. in RAM) at once.
+    nproc = nproc or os.cpu_count()
+    work = partial(subsample_batch, input_filename, batch_size=batch_size)
+    with Pool(nproc) as pool:
+        pending = deque()
+
+        def write_oldest():
+            i, result = pending.popleft()
+            frames[i:i+batch_size] = result.get()
+
+        for i in range(0, N, batch_size):
+            pending.append((i, pool.apply_async(work, (i,))))
+            if len(pending) >= 2*nproc:
+                write_oldest()
+        while pending:
+            write_oldest()
+
+    X_sub.flush()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", type=int, default=1, help="Number flag")
+    args = parser.parse_args()
 
-    X_lp = np.array([subsample(x) for x in X_lp])
-    X_lp = X_lp.reshape((X_lp.shape[0], (X_lp.shape[1])*(X_lp.shape[2])))
+    number = args.number
 
-    np.save(output_filename, X_lp)
+    input_filename = data_dir / f'QG_samples_HRES_{iterations}_{number}.npy'
+    output_filename = data_dir / f'QG_samples_SUBS_{iterations}_{number}.npy'
 
-generate_SUBS()
-print("Script finished")
+    print("Script started")
+    generate_SUBS(input_filename, output_filename)
+    print("Script finished")
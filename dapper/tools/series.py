@@ -3,6 +3,7 @@
 import numpy as np
 from numpy import nan
 from patlib.std import find_1st_ind
+from scipy.signal import fftconvolve
 from struct_tools import NicePrint
 
 from dapper.tools.rounding import UncertainQtty
@@ -16,17 +17,38 @@ def auto_cov(xx, nlags=4, zero_mean=False, corr=False):
 
     With `corr=True`, this is identical to
     `statsmodels.tsa.stattools.acf(xx,True,nlags)`
+
+    For many lags, the lagged products are summed via FFT, in `O(N log N)`.
+    For few lags, summing them directly, lag by lag, is faster.
     """
     assert nlags < len(xx)
 
     N = len(xx)
     A = xx if zero_mean else (xx - xx.mean(0))
-    acovf = np.zeros((nlags+1,)+xx.shape[1:])
+    A = np.asarray(A, dtype=float)
+    lags = np.arange(nlags+1)
+
+    if A.ndim == 1:
+        # Common case (e.g. mean_with_conf). The loop uses BLAS dot, which
+        # is fast enough to beat FFT for nlags up to ≈ 2.5*sqrt(N)
+        # (measured at nlags ≈ 70, 190, 800 for N=1e3, 1e4, 1e5).
+        use_fft = nlags > 2.5*np.sqrt(N)
+    else:
+        # Rough crossover (vs. the einsum loop below) for multivariate series.
+        # The true one also depends on the number of columns, e.g. (N=1e3, 1e5)
+        # it was measured at nlags ≈ 20, 60 for 3 columns, and ≈ 90, 160 for 40.
+        use_fft = nlags > 5*np.log2(N)
 
-    for i in range(nlags+1):
-        Left  = A[np.arange(N-i)]
-        Right = A[np.arange(i, N)]
-        acovf[i] = (Left*Right).sum(0)/(N-i)
+    if use_fft:
+        acovf = fftconvolve(A, A[::-1], axes=0)[N-1:N+nlags]
+    else:
+        acovf = np.zeros((nlags+1,)+xx.shape[1:])
+        for i in lags:
+            if A.ndim == 1:
+                acovf[i] = A[:N-i] @ A[i:]
+            else:
+                acovf[i] = np.einsum('i...,i...->...', A[:N-i], A[i:])
+    acovf /= (N - lags).reshape((-1,)+(1,)*(A.ndim-1))
 
     if corr:
         acovf /= acovf[0]
@@ -43,11 +65,9 @@ def fit_acf_by_AR1(acf_empir, nlags=None):
     if nlags is None:
         nlags = len(acf_empir)
 
-    # geometric_mean = ss.mstats.gmean
-    def geometric_mean(xx): return np.exp(np.mean(np.log(xx)))
-
     def mean_ratio(xx):
-        return geometric_mean([xx[i]/xx[i-1] for i in range(1, len(xx))])
+        # Geometric mean of the ratios xx[i]/xx[i-1], which telescopes.
+        return (xx[-1]/xx[0])**(1/(len(xx)-1))
 
     # Negative correlation => Truncate ACF
     neg_ind   = find_1st_ind(np.array(acf_empir) <= 0)
@@ -103,8 +123,14 @@ def mean_with_conf(xx):
         #
         # See https://stats.stackexchange.com/q/90062
         # c = sum([(N-k)*a**k for k in range(1,N)])
-        # But this series is analytically tractable:
-        c = ((N-1)*a - N*a**2 + a**(N+1)) / (1-a)**2
+        # But this series is analytically tractable.
+        # However, as a -> 1, the closed form suffers from cancellation
+        # (and is nan at a=1). Then, sum the (positive) terms directly.
+        if N*(1-a) > 1:
+            c = ((N-1)*a - N*a**2 + a**(N+1)) / (1-a)**2
+        else:
+            k = np.arange(1, N)
+            c = np.sum((N-k) * a**k)
         confidence_correction = 1 + 2/N * c
         var *= confidence_correction
         uq = UncertainQtty(mu, np.sqrt(var))
@@ -248,10 +274,16 @@ class RollingArray:
     """ND-Array that implements "leftward rolling" along axis 0.
 
     Used for data that gets plotted in sliding graphs.
+
+    Implemented as a circular buffer, so that `insert` does not copy the data.
+    The chronologically ordered `array` is built (copied) lazily,
+    at most once per `insert`, and cached.
     """
 
     def __init__(self, shape, fillval=nan):
-        self.array = np.full(shape, fillval)
+        self._array = np.full(shape, fillval)
+        self._ordered = None  # cache of self.array
+        self.head = 0    # physical index of the leftmost (oldest) item
         self.k1 = 0      # previous k
         self.nFilled = 0
 
@@ -267,10 +299,13 @@ class RollingArray:
         # self.array[-1] = val
 
         dk = max(1, dk)
-        # TODO 7: Should have used deque?
-        self.array = np.roll(self.array, -dk, axis=0)
-        self.array[-dk:] = nan
-        self.array[-1:] = val
+        # Overwrite the dk oldest items (i.e. roll them to the right end).
+        N = len(self)
+        new = (self.head + np.arange(min(dk, N))) % N
+        self._array[new] = nan
+        self._array[new[-1]] = val
+        self.head = (new[-1] + 1) % N
+        self._ordered = None
 
         self.k1 = k
         self.nFilled = min(len(self), self.nFilled+dk)
@@ -281,17 +316,33 @@ class RollingArray:
     def span(self):
         return (self.leftmost(), self[-1])
 
+    @property
+    def array(self):
+        if self._ordered is None:
+            h = self.head
+            self._ordered = np.concatenate((self._array[h:], self._array[:h]))
+        return self._ordered
+
     @property
     def T(self):
         return self.array.T
 
     def __array__(self, _dtype=None): return self.array
-    def __len__(self): return len(self.array)
+    def __len__(self): return len(self._array)
     def __repr__(self): return 'RollingArray:\n%s' % str(self.array)
-    def __getitem__(self, key): return self.array[key]
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            # Shortcut: avoid re-ordering the whole array.
+            N = len(self)
+            if not -N <= key < N:
+                raise IndexError("RollingArray index out of range")
+            return self._array[(self.head + key) % N]
+        return self.array[key]
 
     def __setitem__(self, key, val):
         # Don't implement __setitem__ coz leftmost() is then
         # not generally meaningful (i.e. if an element is set in the middle).
-        # Of course self.array can still be messed with.
+        # Note that self.array is a (cached) re-ordered copy of the buffer,
+        # so writing to it has no lasting effect.
         raise AttributeError("Values should be set with update()")
@@ -0,0 +1,97 @@
+"""Tests for `dapper.tools.series`."""
+
+import numpy as np
+import pytest
+from numpy import nan
+
+import dapper.tools.series as series
+from dapper.tools.series import RollingArray, auto_cov
+
+
+class RollingArrayRef:
+    """Reference implementation (by `np.roll`) of `RollingArray.insert`."""
+
+    def __init__(self, shape):
+        self.array = np.full(shape, nan)
+        self.k1 = 0
+        self.nFilled = 0
+
+    def insert(self, k, val):
+        dk = max(1, k-self.k1)
+        self.array = np.roll(self.array, -dk, axis=0)
+        self.array[-dk:] = nan
+        self.array[-1:] = val
+        self.k1 = k
+        self.nFilled = min(len(self.array), self.nFilled+dk)
+
+
+def assert_same(a, b):
+    assert np.array_equal(a, b, equal_nan=True)
+
+
+@pytest.mark.parametrize("shape", [(1,), (5,), (4, 2), (3, 2, 2)])
+def test_RollingArray(shape):
+    N = shape[0]
+    ra, ref = RollingArray(shape), RollingArrayRef(shape)
+    # dk = 1, 0 (repeated k), >1, ==N and >N
+    dks = [1, 1, 0, 1, 2, 0, 3, 1, N, 1, N+3, 0, 1, 1]
+    k = 0
+    for i, dk in enumerate(dks):
+        k += dk
+        val = i + np.arange(np.prod(shape[1:])).reshape(shape[1:])
+        ra.insert(k, val)
+        ref.insert(k, val)
+
+        assert ra.nFilled == ref.nFilled
+        assert_same(ra.array, ref.array)
+        assert_same(np.asarray(ra), ref.array)
+        assert_same(ra[-1], ref.array[-1])
+        assert_same(ra[0], ref.array[0])
+        assert_same(ra[:, ...], ref.array)
+        leftmost = ref.array[len(ref.array)-ref.nFilled]
+        assert_same(ra.span(), (leftmost, ref.array[-1]))
+
+
+def auto_cov_ref(xx, nlags, zero_mean):
+    """Direct (per-lag) sum of lagged products."""
+    N = len(xx)
+    A = xx if zero_mean else (xx - xx.mean(0))
+    return np.array([(A[:N-i]*A[i:]).sum(0)/(N-i) for i in range(nlags+1)])
+
+
+# N=200 => FFT is used iff nlags > 2.5*sqrt(200) ≈ 35 (1-D),
+# or nlags > 5*log2(200) ≈ 38 (multivariate).
+@pytest.mark.parametrize("nlags", [0, 4, 35, 36, 38, 39, 100, 199])
+@pytest.mark.parametrize("item_shape", [(), (3,), (2, 2)])
+@pytest.mark.parametrize("zero_mean", [False, True])
+def test_auto_cov(nlags, item_shape, zero_mean):
+    rng = np.random.default_rng(3000)
+    xx = rng.standard_normal((200,)+item_shape).cumsum(0)
+    acovf = auto_cov(xx, nlags, zero_mean=zero_mean)
+    ref = auto_cov_ref(xx, nlags, zero_mean)
+    assert acovf.shape == ref.shape
+    assert np.allclose(acovf, ref, rtol=1e-10, atol=1e-10*abs(ref).max())
+    acf = auto_cov(xx, nlags, zero_mean=zero_mean, corr=True)
+    assert np.allclose(acf, ref/ref[0], atol=1e-10)
+
+
+# The closed form for c is used iff N*(1-a) > 1, i.e. a < 1-1/N.
+# Otherwise (incl. a=1, which used to yield nan) the series is summed directly.
+AR1_cases = [(N, 1 - 1/N + da)
+             for N in [10, 1000]
+             for da in [-1e-3, -1e-9, 0, 1e-9, 1e-3]]
+AR1_cases += [(10, 1.0), (1000, 1.0)]
+
+
+@pytest.mark.parametrize(("N", "a"), AR1_cases)
+def test_mean_with_conf(monkeypatch, N, a):
+    monkeypatch.setattr(series, "fit_acf_by_AR1", lambda acovf: a)
+    xx = np.random.default_rng(3000).standard_normal(N)
+
+    k = np.arange(1, N)
+    c = sum((N-k) * a**k)
+    var = auto_cov(xx)[0] / N * (1 + 2/N * c)
+
+    uq = series.mean_with_conf(xx)
+    assert np.isfinite(uq.prec)
+    assert np.isclose(uq.prec, np.sqrt(var), rtol=1e-9)